@@ -7,7 +7,8 @@ import aiohttp
 
 from .config import validate_ip, flatten
 from .exceptions import (
-    CyberarkAPIException, CyberarkException, AiobastionException, CyberarkAIMnotFound
+    CyberarkAPIException, CyberarkException, AiobastionException, CyberarkAIMnotFound,
+    AiobastionConfigurationException
 )
 
 BASE_FILECATEGORY = ("platformId", "userName", "address", "name")
@@ -197,8 +198,64 @@ class Account:
     """
     Utility class to handle account manipulation
     """
-    def __init__(self, epv):
+    _ACCOUNT_DEFAULT_LOGON_ACCOUNT_INDEX = 2
+    _ACCOUNT_DEFAULT_RECONCILE_ACCOUNT_INDEX = 3
+
+    def __init__(self, epv, logon_account_index: int = None, reconcile_account_index: int = None):
         self.epv = epv
+        self.logon_account_index = Account._ACCOUNT_DEFAULT_LOGON_ACCOUNT_INDEX
+        self.reconcile_account_index = Account._ACCOUNT_DEFAULT_RECONCILE_ACCOUNT_INDEX
+
+        if logon_account_index is not None:
+            self.logon_account_index = logon_account_index
+
+        if reconcile_account_index is not None:
+            self.reconcile_account_index = reconcile_account_index
+
+    @classmethod
+    def _init_validate_class_attributes(cls, serialized: dict, section: str, configfile: str = None) -> dict:
+        """_init_validate_class_attributes      Initialize and validate the Account definition (file configuration and serialized)
+
+        Arguments:
+            serialized {dict}           Account defintion
+            section {str}               verified section name
+
+        Keyword Arguments:
+            configfile {str}            Name of the configuration file
+
+        Raises:
+            AiobastionConfigurationException
+
+        Returns:
+            d {dict}                    Account defintion
+        """
+        d = {
+            "logon_account_index": Account._ACCOUNT_DEFAULT_LOGON_ACCOUNT_INDEX,
+            "reconcile_account_index": Account._ACCOUNT_DEFAULT_RECONCILE_ACCOUNT_INDEX
+        }
+
+        for k in serialized.keys():
+            keyname = k.lower()
+
+            try:
+                if keyname in d:
+                    d[keyname] = int(serialized[k])
+                else:
+                    if configfile:
+                        s = f"Unknown attribute '{k}' within section '{section}' " + \
+                            f"in {configfile}"
+                    else:
+                        s = f"Unknown attribute '{k}' within section '{section}'"
+
+                    raise AiobastionConfigurationException(s)
+            except (TypeError, ValueError):
+                if configfile:
+                    s = f"Invalid integer defintion '{keyname}'  within section '{section}' in {configfile}: {serialized[k]!r}"
+                else:
+                    s = f"Invalid integer defintion '{keyname}'  within section '{section}': {serialized[k]!r}"
+
+                raise AiobastionConfigurationException(s)
+        return d
 
     async def _handle_acc_list(self, api_call, account, *args, **kwargs):
         """
@@ -347,7 +404,7 @@ class Account:
         :return: A boolean that indicates if the operation was successful.
         :raises CyberarkException: If link failed
         """
-        return await self.link_account(account, reconcile_account, 3)
+        return await self.link_account(account, reconcile_account, self.reconcile_account_index)
 
     async def link_logon_account(self, account: Union[PrivilegedAccount, List[PrivilegedAccount]],
                                  logon_account: PrivilegedAccount):
@@ -361,7 +418,7 @@ class Account:
         :return: A boolean that indicates if the operation was successful.
         :raises CyberarkException: If link failed
         """
-        return await self.link_account(account, logon_account, self.epv.LOGON_ACCOUNT_INDEX)
+        return await self.link_account(account, logon_account, self.logon_account_index)
 
     async def link_reconcile_account_by_address(self, acc_username, rec_acc_username, address):
         """ This function links the account with the given username and address to the reconciliation account with
@@ -397,7 +454,7 @@ class Account:
         """
         | This function unlinks the reconciliation account of the given account (or the list of accounts)
         | ⚠️ The "reconcile" Account is supposed to have an index of 3
-        | You can change it by setting custom:RECONCILE_ACCOUNT_INDEX in your config file
+        | You can change it by setting account:reconcile_account_index in your config file
 
 
         :param account: a PrivilegedAccount object or a list of PrivilegedAccount objects
@@ -405,20 +462,20 @@ class Account:
         :return: A boolean that indicates if the operation was successful.
         :raises CyberarkException: If link failed:
         """
-        return await self.unlink_account(account, self.epv.RECONCILE_ACCOUNT_INDEX)
+        return await self.unlink_account(account, self.reconcile_account_index)
 
     async def remove_logon_account(self, account: Union[PrivilegedAccount, List[PrivilegedAccount]]):
         """
         | This function unlinks the logon account of the given account (or the list of accounts)
         | ⚠️ The "logon" Account index is default to 2 but can be set differently on the platform
-        | You can change it by setting custom:LOGON_ACCOUNT_INDEX in your config file
+        | You can change it by setting account:logon_account_index in your config file
 
         :param account: a PrivilegedAccount object or a list of PrivilegedAccount objects
         :type account: PrivilegedAccount, list
         :return: A boolean that indicates if the operation was successful.
         :raises CyberarkException: If link failed:
         """
-        return await self.unlink_account(account, self.epv.LOGON_ACCOUNT_INDEX)
+        return await self.unlink_account(account, self.logon_account_index)
 
     async def unlink_account(self, account: Union[PrivilegedAccount, List[PrivilegedAccount]],
                              extra_password_index: int):
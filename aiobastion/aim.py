@@ -1,40 +1,261 @@
 import asyncio
-import copy
+import atexit
+import hashlib
 import json
+import operator
 import os
 import ssl
-from collections import namedtuple
+import stat
 from http import HTTPStatus
-from typing import Union, Tuple, Optional
+from typing import Union, Tuple, Optional, List, NamedTuple
 
 import aiohttp
 from aiohttp import ContentTypeError
 
+try:
+    # Optional faster JSON decoder (orjson.JSONDecodeError is a json.decoder.JSONDecodeError)
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
 from .exceptions import AiobastionException, CyberarkException, CyberarkAPIException, CyberarkAIMnotFound, AiobastionConfigurationException
-from .cyberark import EPV
+from .defaults import (
+    CYBERARK_DEFAULT_KEEP_COOKIES, CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS, CYBERARK_DEFAULT_TIMEOUT,
+    CYBERARK_DEFAULT_VERIFY
+)
 
 # AIM section
-AIM_secret_resp = namedtuple('AIM_secret_resp', ['secret', 'detail'])
+# Request headers of the GetPassword Web Service (shared by all requests, never modified)
+_AIM_HEADERS = {"Content-type": "application/json"}
+
+
+class AIM_secret_resp(NamedTuple):
+    """ Result of get_secret_detail """
+    secret: str         # password
+    detail: dict        # dictionary from the Central Credential Provider (AIM) GetPassword Web Service
+
+
+# HTTP status codes known by HTTPStatus (CyberArk or a proxy may return other ones)
+_HTTP_STATUS_SET = frozenset(s.value for s in HTTPStatus)
+
+
+def _build_api_exception(status: int, resp_json: Optional[dict], details) -> Exception:
+    """_build_api_exception      Build the exception of an AIM error response
+
+    Arguments:
+        status {int}                HTTP status
+        resp_json {dict}            decoded response or None if it is not a JSON
+        details                     Additional details of the exception
+    """
+    if resp_json and "ErrorCode" in resp_json and "ErrorMsg" in resp_json:
+        if resp_json["ErrorCode"] == "APPAP004E":
+            return CyberarkAIMnotFound(status, resp_json["ErrorCode"], resp_json["ErrorMsg"], details)
+
+        return CyberarkAPIException(status, resp_json["ErrorCode"], resp_json["ErrorMsg"], details)
+
+    phrase = HTTPStatus(status).phrase if status in _HTTP_STATUS_SET else str(status)
+
+    return CyberarkAPIException(status, "HTTP_ERR_CODE", phrase, details)
+
+
+# Converters of the AIM definition attributes (see EPV_AIM._PARSE_DISPATCH)
+def _aim_value(val, keyname, section, configfile):
+    return val
+
+
+def _aim_integer(val, keyname, section, configfile):
+    return EPV_AIM._to_integer(val, keyname, section, configfile)
+
+
+def _aim_boolean(val, keyname, section, configfile):
+    if isinstance(val, bool):
+        return val
+
+    if configfile:
+        s = f"Invalid boolean defintion '{keyname}'  within section '{section}' in {configfile}: {val!r}"
+    else:
+        s = f"Invalid boolean defintion '{keyname}'  within section '{section}': {val!r}"
+
+    raise AiobastionConfigurationException(s)
+
+
+def _mask_params(params: dict) -> dict:
+    # Mask the appid attribute, if you are a security maniac
+    if "appid" in params:
+        return {**params, "appid": "<hidden>"}
+
+    return params
+
+
+class _AIMErrorDetail:
+    """ Additional details of an AIM error (url and params with the appid masked).
+
+    Only the masked params are kept. The string is only built when the exception is displayed,
+    a caller catching the exception (e.g. CyberarkAIMnotFound) does not pay for it.
+    """
+    __slots__ = ("url", "params")
+
+    def __init__(self, url: str, params: dict):
+        self.url = url
+        self.params = _mask_params(params)
+
+    def __str__(self):
+        return f"url: {self.url}, params: {self.params}"
+
+    __repr__ = __str__
+
+
+class _AIMAdmission:
+    """ Admission control of the AIM requests: at most *limit* requests run in parallel.
+
+    The counter belongs to the condition, so a request always leaves the admission it entered,
+    even if the AIM session has been closed (and a new admission created) meanwhile.
+    """
+    __slots__ = ("cv", "count", "limit")
+
+    def __init__(self, limit: int):
+        self.cv = asyncio.Condition()
+        self.count = 0
+        self.limit = limit
+
+    async def set_limit(self, limit: int):
+        async with self.cv:
+            self.limit = limit
+            self.cv.notify_all()
+
+    async def __aenter__(self):
+        async with self.cv:
+            try:
+                await self.cv.wait_for(lambda: self.count < self.limit)
+            except asyncio.CancelledError:
+                # The request may have been woken up just before being cancelled: pass the wake-up on
+                self.cv.notify(1)
+                raise
+
+            self.count += 1
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self.cv:
+            self.count -= 1
+            self.cv.notify(1)
+
+
+class _SharedSession:
+    """ aiohttp session shared by the EPV_AIM instances using the same event loop, host and SSL context """
+    __slots__ = ("key", "session", "users")
+
+    def __init__(self, key: tuple, session: aiohttp.ClientSession):
+        self.key = key
+        self.session = session
+        self.users = 0              # EPV_AIM instances using the session, the last one closes it
+
+
+# Client SSL contexts of the AIM interface:
+#   {(cert, key, passphrase digest, verify, verify_is_dir, cert_mtime, key_mtime, verify_mtime): SSLContext}
+_ssl_contexts = {}
+
+# Key of the passphrase digests, so that the digests kept in memory can't be brute-forced offline
+_PASSPHRASE_DIGEST_KEY = os.urandom(32)
+
+
+def _passphrase_digest(passphrase):
+    """ Identify a passphrase in a cache key, without keeping the passphrase itself """
+    if isinstance(passphrase, str):
+        passphrase = passphrase.encode()
+
+    if isinstance(passphrase, (bytes, bytearray)):
+        return hashlib.blake2b(passphrase, key=_PASSPHRASE_DIGEST_KEY).digest()
+
+    return passphrase       # None or a callable returning the passphrase (see ssl.SSLContext.load_cert_chain)
+
+
+def _build_ssl_context(cert: str, key: Optional[str], passphrase: Optional[str], verify: Union[str, bool],
+                       verify_is_dir: bool, cert_mtime: float, key_mtime: float,
+                       verify_mtime: Optional[float]) -> ssl.SSLContext:
+    """_build_ssl_context     Build (and cache) the client SSL context of the AIM interface
+
+    The modification times of the certificate files and of the CA (file or directory) are part
+    of the cache key, so that a renewed certificate or CA is reloaded. The passphrase is only
+    part of it as a digest.
+    """
+    cache_key = (cert, key, _passphrase_digest(passphrase), verify, verify_is_dir, cert_mtime, key_mtime,
+                 verify_mtime)
+
+    ssl_context = _ssl_contexts.get(cache_key)
+
+    if ssl_context is None:
+        ssl_context = _new_ssl_context(cert, key, passphrase, verify, verify_is_dir)
+
+        if len(_ssl_contexts) >= 16:
+            _ssl_contexts.clear()
+
+        _ssl_contexts[cache_key] = ssl_context
+
+    return ssl_context
+
+
+def _new_ssl_context(cert: str, key: Optional[str], passphrase: Optional[str], verify: Union[str, bool],
+                     verify_is_dir: bool) -> ssl.SSLContext:
+    if isinstance(verify, str):
+        if verify_is_dir:
+            ssl_context = ssl.create_default_context(capath=verify)
+        else:
+            ssl_context = ssl.create_default_context(cafile=verify)
+    else:  # True or False
+        ssl_context = ssl.create_default_context()
+
+        if not verify:  # False
+            ssl_context.check_hostname = False
+
+    ssl_context.load_cert_chain(cert, keyfile=key, password=passphrase)
+
+    return ssl_context
 
 
 class EPV_AIM:
     """
     Class managing communication with the Central Credential Provider (AIM) GetPassword Web Service
     """
+    __slots__ = ("host", "appid", "cert", "key", "passphrase", "verify", "timeout", "max_concurrent_tasks",
+                 "keep_cookies", "session", "request_params", "_url_cache",
+                 "_admission", "_shared")
+
     _SERIALIZED_FIELDS_IN = ["host", "appid", "cert", "key", "verify", "timeout", "max_concurrent_tasks",
                              "keep_cookies", "passphrase"]
     _SERIALIZED_FIELDS_OUT = ["host", "appid", "cert", "key", "verify", "timeout", "max_concurrent_tasks",
                              "keep_cookies"]    # Exclude "passphrase"
-
-    _GETPASSWORD_REQUEST_PARM = ["safe", "folder", "object", "username", "address", "database",
-                                 "policyid", "reason", "connectiontimeout", "query", "queryformat",
-                                 "failrequestonpasswordchange"]
+    _SERIALIZED_GETTER_OUT = operator.attrgetter(*_SERIALIZED_FIELDS_OUT)
+
+    # AIM definition attributes (file configuration and serialized): {keyname: (attribute, converter)}
+    _PARSE_DISPATCH = {
+        "appid":                ("appid", _aim_value),
+        "cert":                 ("cert", _aim_value),
+        "host":                 ("host", _aim_value),
+        "key":                  ("key", _aim_value),
+        "passphrase":           ("passphrase", _aim_value),
+        "timeout":              ("timeout", _aim_integer),
+        "keep_cookies":         ("keep_cookies", _aim_boolean),
+        "maxtasks":             ("max_concurrent_tasks", _aim_integer),     # synonym
+        "max_concurrent_tasks": ("max_concurrent_tasks", _aim_integer),
+        "ca":                   ("verify", _aim_value),                     # synonym
+        "verify":               ("verify", _aim_value),
+    }
+
+    _GETPASSWORD_REQUEST_PARM = frozenset(["safe", "folder", "object", "username", "address", "database",
+                                           "policyid", "reason", "connectiontimeout", "query", "queryformat",
+                                           "failrequestonpasswordchange"])
+
+    # aiohttp sessions shared by all EPV_AIM instances: {(event loop, host, ssl context): _SharedSession}
+    _shared_sessions = {}
+
+    # Validated AIM definitions: {(section, frozenset of (key, type, value)): AIM definition}
+    _validated_attributes = {}
 
     def __init__(self, host: Optional[str] = None, appid: Optional[str] = None, cert: Optional[str] = None, key: Optional[str] = None,
                  passphrase: Optional[str] = None, verify: Optional[Union[str, bool]] = None,
-                 timeout: int = EPV.CYBERARK_DEFAULT_TIMEOUT,
-                 max_concurrent_tasks: int = EPV.CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS,
-                 keep_cookies: bool = EPV.CYBERARK_DEFAULT_KEEP_COOKIES,
+                 timeout: int = CYBERARK_DEFAULT_TIMEOUT,
+                 max_concurrent_tasks: int = CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS,
+                 keep_cookies: bool = CYBERARK_DEFAULT_KEEP_COOKIES,
                  serialized: Optional[dict] = None):
 
         self.host = host
@@ -48,9 +269,13 @@ class EPV_AIM:
         self.keep_cookies = keep_cookies                        # Whether to keep cookies between AIM calls
 
         # Session management
-        self.__sema = None
         self.session = None
         self.request_params = None
+        self._url_cache = {}                                    # {short_url: url}, built on AIM setup
+
+        # Admission control of the AIM requests (see set_concurrency)
+        self._admission = None
+        self._shared = None                                     # _SharedSession of self.session if it is shared
 
         if serialized:
             for k, v in serialized.items():
@@ -62,10 +287,10 @@ class EPV_AIM:
 
         # Optional attributes
         if self.timeout is None:
-            self.timeout = EPV.CYBERARK_DEFAULT_TIMEOUT
+            self.timeout = CYBERARK_DEFAULT_TIMEOUT
 
         if self.max_concurrent_tasks is None:
-            self.max_concurrent_tasks = EPV.CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS
+            self.max_concurrent_tasks = CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS
 
         if self.verify is not False and not (isinstance(self.verify, str) and not isinstance(self.verify, bool)):
             raise AiobastionException(
@@ -76,6 +301,57 @@ class EPV_AIM:
     def _init_validate_class_attributes(cls, serialized: dict, section: str, configfile: Optional[str] = None) -> dict:
         """_init_validate_class_attributes      Initialize and validate the EPV_AIM definition (file configuration and serialized)
 
+        The result is cached by section and content of the definition (except the passphrase),
+        a copy is returned.
+
+        Arguments:
+            serialized_aim {dict}       AIM defintion
+            section {str}               verified section name
+
+        Keyword Arguments:
+            configfile {str}            Name of the configuration file
+
+        Raises:
+            AiobastionConfigurationException
+
+        Returns:
+            serialized_aim {dict}       AIM defintion
+        """
+        # The passphrase is neither part of the cache key nor of the cached definition
+        passphrase = None
+        public = {}
+
+        for k, v in serialized.items():
+            if k.lower() == "passphrase":
+                passphrase = v
+            else:
+                public[k] = v
+
+        try:
+            # The value type is part of the key, since True == 1 (keep_cookies must be a boolean)
+            cache_key = (section, frozenset((k, type(v), v) for k, v in public.items()))
+        except TypeError:
+            # Unhashable value: the definition is invalid or unusual, don't cache it
+            cache_key = None
+
+        serialized_aim = cls._validated_attributes.get(cache_key)
+
+        if serialized_aim is None:
+            serialized_aim = cls._validate_class_attributes(public, section, configfile)
+
+            if cache_key is not None:
+                if len(cls._validated_attributes) >= 32:
+                    cls._validated_attributes.clear()
+
+                cls._validated_attributes[cache_key] = serialized_aim
+
+        # The values are hashable (immutable), a shallow copy is enough
+        return {**serialized_aim, "passphrase": passphrase}
+
+    @classmethod
+    def _validate_class_attributes(cls, serialized: dict, section: str, configfile: Optional[str] = None) -> dict:
+        """_validate_class_attributes      Validate the EPV_AIM definition (file configuration and serialized)
+
         Arguments:
             serialized_aim {dict}       AIM defintion
             section {str}               verified section name
@@ -93,7 +369,7 @@ class EPV_AIM:
             "appid":                None,       # Default = Connection (appid)
             "cert":                 None,
             "host":                 None,       # Default = PVWA (host)
-            "keep_cookies":         EPV.CYBERARK_DEFAULT_KEEP_COOKIES,
+            "keep_cookies":         CYBERARK_DEFAULT_KEEP_COOKIES,
             "key":                  None,
             "max_concurrent_tasks": None,       # Default = PVWA (max_concurrent_tasks)
             "passphrase":           None,
@@ -104,32 +380,20 @@ class EPV_AIM:
         synonym_verify = 0
         synonym_max_concurrent_tasks = 0
 
-        for k in serialized.keys():
+        for k, v in serialized.items():
             keyname = k.lower()
 
-            if keyname in ["appid", "cert", "host", "key", "passphrase"]:
-                serialized_aim[keyname] = serialized[k]
-            elif keyname in "timeout":
-                serialized_aim[keyname] = EPV_AIM._to_integer(serialized[k], keyname, section, configfile)
-            elif keyname == "keep_cookies":
-                if isinstance(serialized[k], bool):
-                    serialized_aim[keyname] = serialized[k]
-                else:
-                    if configfile:
-                        s = f"Invalid boolean defintion '{keyname}'  within section '{section}' in {configfile}: {serialized[k]!r}"
-                    else:
-                        s = f"Invalid boolean defintion '{keyname}'  within section '{section}': {serialized[k]!r}"
+            parser = EPV_AIM._PARSE_DISPATCH.get(keyname)
+            if parser is None:
+                raise AiobastionConfigurationException(f"Unknown attribute '{k}' within section 'AIM' in {configfile}")
 
-                    raise AiobastionConfigurationException(s)
+            attr_name, converter = parser
+            serialized_aim[attr_name] = converter(v, keyname, section, configfile)
 
-            elif keyname in ["maxtasks", "max_concurrent_tasks"]:
-                serialized_aim["max_concurrent_tasks"] = EPV_AIM._to_integer(serialized[k], keyname, section, configfile)
-                synonym_max_concurrent_tasks += 1
-            elif keyname in ["ca", "verify"]:
-                serialized_aim["verify"] = serialized[k]
+            if attr_name == "verify":
                 synonym_verify += 1
-            else:
-                raise AiobastionConfigurationException(f"Unknown attribute '{k}' within section 'AIM' in {configfile}")
+            elif attr_name == "max_concurrent_tasks":
+                synonym_max_concurrent_tasks += 1
 
         if synonym_verify > 1:
             raise AiobastionConfigurationException(f"Duplicate synonym parameter: 'ca', 'verify' within section 'AIM'."
@@ -170,7 +434,7 @@ class EPV_AIM:
             serialized_aim["max_concurrent_tasks"] =  pvwa["max_concurrent_tasks"]
         if serialized_aim["verify"] is None:
             if pvwa["verify"] is None:
-                serialized_aim["verify"] = EPV.CYBERARK_DEFAULT_VERIFY
+                serialized_aim["verify"] = CYBERARK_DEFAULT_VERIFY
             else:
                 serialized_aim["verify"] = pvwa["verify"]
 
@@ -178,15 +442,18 @@ class EPV_AIM:
 
     @staticmethod
     def _to_integer(val, keyname, section, configfile):
+        if isinstance(val, int) and not isinstance(val, bool):
+            return val
+
         try:
             v = int(val)
-        except ValueError:
+        except (TypeError, ValueError):
             if configfile:
                 s = f"Invalid integer defintion '{keyname}'  within section '{section}' in {configfile}: {val!r}"
             else:
                 s = f"Invalid integer defintion '{keyname}'  within section '{section}': {val!r}"
 
-            raise s
+            raise AiobastionConfigurationException(s) from None
 
         return v
 
@@ -204,49 +471,58 @@ class EPV_AIM:
                 raise AiobastionException(f"Missing AIM mandatory parameter '{attr_name}'."
                                           " Required parameters are: host, appid, key.")
 
-        if not os.path.exists(self.cert):
+        try:
+            cert_mtime = os.stat(self.cert).st_mtime
+        except OSError:
             raise AiobastionException(f"Parameter 'cert' in AIM: Public certificate file not found: {self.cert!r}")
 
-        if self.key and not os.path.exists(self.key):
-            raise AiobastionException(f"Parameter 'key' in AIM: Private key certificat file not found: {self.key!r}")
+        if self.key:
+            try:
+                key_mtime = os.stat(self.key).st_mtime
+            except OSError:
+                raise AiobastionException(f"Parameter 'key' in AIM: Private key certificat file not found: {self.key!r}")
+        else:
+            key_mtime = cert_mtime
 
         # if verify is not set, default to no ssl
         if self.verify is False:
-            self.verify = EPV.CYBERARK_DEFAULT_VERIFY
+            self.verify = CYBERARK_DEFAULT_VERIFY
 
         if not (isinstance(self.verify, str) or isinstance(self.verify, bool)):
             raise AiobastionException(
                 f"Invalid type for parameter 'verify' (or 'CA') in AIM: {type(self.verify)} value: {self.verify!r}")
 
-        if (isinstance(self.verify, str) and not os.path.exists(self.verify)):
-            raise AiobastionException(f"Parameter 'verify' in AIM: file not found {self.verify!r}")
-
         if isinstance(self.verify, str):
-            if not os.path.exists(self.verify):
+            try:
+                verify_stat = os.stat(self.verify)
+            except OSError:
                 raise AiobastionException(f"Parameter 'verify' in AIM: file not found {self.verify!r}")
 
-            if os.path.isdir(self.verify):
-                ssl_context = ssl.create_default_context(capath=self.verify)
-            else:
-                ssl_context = ssl.create_default_context(cafile=self.verify)
-        else:  # True or False
-            ssl_context = ssl.create_default_context()
-
-            if not self.verify:  # False
-                ssl_context.check_hostname = False
+            verify_is_dir = stat.S_ISDIR(verify_stat.st_mode)
+            verify_mtime = verify_stat.st_mtime
+        else:
+            verify_is_dir = False
+            verify_mtime = None
 
-        ssl_context.load_cert_chain(self.cert, keyfile=self.key, password=self.passphrase)
+        ssl_context = _build_ssl_context(self.cert, self.key, self.passphrase, self.verify, verify_is_dir,
+                                         cert_mtime, key_mtime, verify_mtime)
 
         self.request_params = \
             {"timeout": self.timeout,
              "ssl": ssl_context}
 
+        # The host may have changed since the last setup (see EPV.login_with_aim)
+        self._url_cache = {"Accounts": f"https://{self.host}/AIMWebService/api/Accounts"}
+
     @staticmethod
     def valid_secret_params(params: dict = None) -> str:
         error_str = ""
 
         if not isinstance(params, dict):
             error_str = "parameter is not a dictionary"
+        elif params.keys() <= EPV_AIM._GETPASSWORD_REQUEST_PARM:
+            # All keys are valid and already in lowercase
+            pass
         else:
             # Must be a list of keys to modify the dictionary key (not the dictionary itself)
             for k in list(params.keys()):
@@ -262,12 +538,11 @@ class EPV_AIM:
         return error_str
 
     def set_semaphore(self, sema, session):
-        """ Initialize the semaphore of the AIM interface,
-            so that EPV and EPV_AIM could share the same semaphore.
-        """
-        if not self.__sema:
-            self.__sema = sema
+        """ Initialize the session of the AIM interface, so that EPV and EPV_AIM could share the same session.
 
+        | ℹ️ The semaphore is not used anymore: the parallel AIM requests are limited by
+            *max_concurrent_tasks* (see *set_concurrency*).
+        """
         if not self.session:
             if self.request_params is None:
                 self.validate_and_setup_aim_ssl()
@@ -275,18 +550,15 @@ class EPV_AIM:
             self.session = session
 
     def to_json(self):
-        serialized = {}
-
-        for attr_name in EPV_AIM._SERIALIZED_FIELDS_OUT:
-            serialized[attr_name] = getattr(self, attr_name, None)
-
-        return serialized
+        return dict(zip(EPV_AIM._SERIALIZED_FIELDS_OUT, EPV_AIM._SERIALIZED_GETTER_OUT(self)))
 
     def get_url(self, url) -> Tuple[str, dict]:
-        addr = f"https://{self.host}/AIMWebService/api/{url}"
-        head = {"Content-type": "application/json"}
+        addr = self._url_cache.get(url)
 
-        return addr, head
+        if addr is None:
+            addr = self._url_cache[url] = f"https://{self.host}/AIMWebService/api/{url}"
+
+        return addr, _AIM_HEADERS
 
     # Context manager
     async def __aenter__(self):
@@ -298,31 +570,115 @@ class EPV_AIM:
         await self.close_aim_session()
 
     def get_aim_session(self):
-        if self.session is None:
+        if self.session is None or self.session.closed:
             if self.request_params is None:
                 self.validate_and_setup_aim_ssl()
-                # Previously we tried to use aiohttp session,
-                # but now we are always doing our own session for AIM
-                # TODO: test this with aiohttp.ClientSession(cookies = self.cookies)
-            self.session = aiohttp.ClientSession()
 
-        if self.__sema is None:
-            self.__sema = asyncio.Semaphore(self.max_concurrent_tasks)
+            # The shared session may have been closed by close_shared_sessions: stop using it
+            self._release_shared_session()
+
+            # The connection pool is shared with the other EPV_AIM instances using the same
+            # host and SSL context, so that TCP and TLS connections are kept alive between them.
+            self._shared = EPV_AIM._get_shared_session(self.host, self.request_params["ssl"], self.timeout)
+            self._shared.users += 1
+            self.session = self._shared.session
+
+        if self._admission is None:
+            self._admission = _AIMAdmission(self.max_concurrent_tasks)
 
         return self.session
 
+    async def set_concurrency(self, max_concurrent_tasks: int):
+        """ Change the maximum number of parallel AIM requests.
+
+        The requests already running are not interrupted and the waiting requests are kept,
+        so it may be called at any time (e.g. to slow down when the AIM is overloaded).
+
+        :param max_concurrent_tasks: Maximum number of parallel AIM requests
+        :raise AiobastionException: Invalid value
+        """
+        if not isinstance(max_concurrent_tasks, int) or max_concurrent_tasks < 1:
+            raise AiobastionException(f"Invalid value for max_concurrent_tasks: {max_concurrent_tasks!r}")
+
+        self.max_concurrent_tasks = max_concurrent_tasks
+
+        if self._admission is not None:
+            await self._admission.set_limit(max_concurrent_tasks)
+
+    @classmethod
+    def _get_shared_session(cls, host: str, ssl_context: ssl.SSLContext, timeout: int) -> _SharedSession:
+        """_get_shared_session      Return the process-wide session for an AIM host and SSL context
+
+        A session is bound to its event loop, so the running loop is part of the key.
+        The SSL context and timeout are still given on each request (request_params), since
+        the session may also be the one given by set_semaphore.
+        The connection pool has no limit: each EPV_AIM instance limits its own parallel requests
+        (max_concurrent_tasks, see set_concurrency).
+        """
+        loop = asyncio.get_running_loop()
+        key = (loop, host, ssl_context)
+
+        shared = cls._shared_sessions.get(key)
+
+        if shared is None or shared.session.closed:
+            # Close the sessions of the event loops that are gone (never closed by their users)
+            for k in [k for k in cls._shared_sessions if k[0].is_closed()]:
+                loop.create_task(cls._shared_sessions.pop(k).session.close())
+
+            # All the requests go to the same host: cache its DNS resolution
+            connector = aiohttp.TCPConnector(ssl=ssl_context, limit=0, ttl_dns_cache=300, keepalive_timeout=75)
+            session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=timeout))
+            shared = cls._shared_sessions[key] = _SharedSession(key, session)
+
+        return shared
+
+    def _release_shared_session(self) -> Optional[aiohttp.ClientSession]:
+        """ Stop using the shared session, return it if it must be closed (no other user) """
+        shared, self._shared = self._shared, None
+
+        if shared is None:
+            return None
+
+        shared.users -= 1
+
+        if shared.users > 0:
+            return None
+
+        if EPV_AIM._shared_sessions.get(shared.key) is shared:
+            del EPV_AIM._shared_sessions[shared.key]
+
+        return shared.session
+
+    @classmethod
+    async def close_shared_sessions(cls):
+        """ Close the shared AIM sessions of the running event loop, even if they are still used
+            (the EPV_AIM instances open a new one on their next request).
+
+            | ℹ️ A shared session is also closed with its last user (*close_aim_session*),
+                and the sessions still open are closed at interpreter exit.
+        """
+        loop = asyncio.get_running_loop()
+
+        for key in [k for k in cls._shared_sessions if k[0] is loop]:
+            await cls._shared_sessions.pop(key).session.close()
+
     async def close_aim_session(self):
+        if self._shared is not None:
+            # A shared session is closed by its last user
+            session = self._release_shared_session()
+        else:
+            # The session is not a shared one (e.g. given by set_semaphore)
+            session = self.session
+
         try:
-            if self.session:
-                # Are we using the epv.session, if so don't close it
-                # if self.epv is None or self.epv.session is None or \
-                #         (self.epv.session and self.epv.session != self.session):
-                await self.session.close()
+            if session:
+                await session.close()
         except (CyberarkException, AttributeError):
             pass
 
         self.session = None
-        self.__sema = None
+        # The running requests release into their own admission, a new one is created with the next session
+        self._admission = None
 
     async def get_secret(self, **kwargs):
         """
@@ -334,6 +690,7 @@ class EPV_AIM:
         :raise CyberarkAIMnotFound: Account not found
         :raise CyberarkAPIException: HTTP error or CyberArk error
         :raise CyberarkException: Execution error
+        :raise AiobastionException: Invalid parameter or AIM configuration setup error
         :return: The password
         """
 
@@ -365,33 +722,82 @@ class EPV_AIM:
             Possible values are: *Exact* or *Regexp*.
         :param failrequestonpasswordchange: Boolean, Whether an error will be returned if
             this web service is called when a password change process is underway or not.
+        :param appid: Application ID of the request (default: *appid* of the AIM definition)
         :return:  namedtuple of (secret, detail)
         |    secret = password
         |    detail = dictionary from the Central Credential Provider (AIM) GetPassword Web Service
         :raise CyberarkAIMnotFound: Account not found
         :raise CyberarkAPIException: HTTP error or CyberArk error
         :raise CyberarkException: Runtime error
-        :raise AiobastionException: AIM configuration setup error
+        :raise AiobastionException: Invalid parameter or AIM configuration setup error
         :return:  namedtuple of (secret, detail)
             secret = password
             detail = dictionary from the Central Credential Provider (AIM) GetPassword Web Service
         """
 
-        detail_info = await self.handle_aim_request("get", "Accounts", params=kwargs)
+        # Check the parameters (and change their names to lowercase) before sending the request
+        params = self._get_secret_params(kwargs)
+
+        detail_info = await self.handle_aim_request("get", "Accounts", params=params)
         secret_detail = AIM_secret_resp(detail_info["Content"], detail_info)
 
         return secret_detail
 
+    async def get_secret_bulk(self, queries: List[dict], return_exceptions: bool = False) -> list:
+        """ Retrieve several secrets from the GetPassword Web Service Central Credential Provider (AIM)
+
+        | ℹ️ The requests run in parallel (at most *max_concurrent_tasks* at a time) and share
+            the same session. The order of the result is the order of *queries*.
+
+        :param queries: list of dictionaries of searchable keys (see *get_secret_detail*), like:
+            ``[{"safe": "Safe1", "object": "Account1"}, {"safe": "Safe1", "object": "Account2"}]``
+        :param return_exceptions: If True, the exception of a failed request is returned in the
+            result list instead of being raised (see *asyncio.gather*).
+        :return: list of namedtuple of (secret, detail)
+        |    secret = password
+        |    detail = dictionary from the Central Credential Provider (AIM) GetPassword Web Service
+        :raise CyberarkAIMnotFound: Account not found
+        :raise CyberarkAPIException: HTTP error or CyberArk error
+        :raise CyberarkException: Runtime error
+        :raise AiobastionException: Invalid parameter or AIM configuration setup error
+        """
+        queries_params = [self._get_secret_params(query) for query in queries]
+
+        session = self.get_aim_session()
+        admission = self._admission
+        url, head = self.get_url("Accounts")
+
+        async def _get_one(params):
+            detail_info = await self._aim_request(session, admission, "get", url, head, params)
+            return AIM_secret_resp(detail_info["Content"], detail_info)
+
+        return await asyncio.gather(*[_get_one(params) for params in queries_params],
+                                    return_exceptions=return_exceptions)
+
+    def _get_secret_params(self, query: dict) -> dict:
+        """ Check the parameters of a GetPassword request and return a copy with the names in lowercase.
+            The application ID may be overridden by the caller ('appid'), the other parameters are
+            searchable keys (see *get_secret_detail*).
+        """
+        # Don't modify the caller dictionary
+        params = dict(query) if isinstance(query, dict) else query
+        appid = self.appid
+
+        if isinstance(params, dict):
+            for k in [k for k in params if isinstance(k, str) and k.lower() == "appid"]:
+                appid = params.pop(k)
+
+        err = EPV_AIM.valid_secret_params(params)
+        if err:
+            raise AiobastionException(f"Invalid AIM request parameter: {err}")
+
+        params["appid"] = appid
+
+        return params
+
     @staticmethod
     def handle_error_detail_info(url: str = None, params: dict = None):
-        # Mask the appid attribute, if you are a security maniac
-        if "appid" in params:
-            params_new = copy.copy(params)
-            params_new["appid"] = "<hidden>"
-        else:
-            params_new = params
-
-        return f"url: {url}, params: {params_new}"
+        return str(_AIMErrorDetail(url, params))
 
     async def handle_aim_request(self, method: str, short_url: str, params: dict = None, filter_func=lambda x: x):
         """
@@ -408,28 +814,33 @@ class EPV_AIM:
         """
         assert method.lower() == "get"
 
-        url, head = self.get_url(short_url)
         session = self.get_aim_session()
+        url, head = self.get_url(short_url)
 
-        if 'applid' not in params:
-            params_new = copy.copy(params)
-            params_new.setdefault('appid', self.appid)
-        else:
-            params_new = params
+        # params is built by the caller for this request only (get_secret_detail kwargs), update it in place
+        if params is None:
+            params = {}
 
-        async with self.__sema:
+        params.setdefault('appid', self.appid)
+
+        return await self._aim_request(session, self._admission, method, url, head, params, filter_func)
+
+    async def _aim_request(self, session: aiohttp.ClientSession, admission: _AIMAdmission, method: str, url: str,
+                           head: dict, params: dict, filter_func=lambda x: x):
+        """ Send an AIM request, once the session, admission, URL and parameters are ready (see handle_aim_request) """
+        async with admission:
             try:
-                async with session.request(method, url, headers=head, params=params_new, **self.request_params) as req:
+                async with session.request(method, url, headers=head, params=params, **self.request_params) as req:
                     # if req.status == 404:
                     #     raise CyberarkException(f"Error 404 : Endpoint {url} not found")
 
                     try:
-                        resp_json = await req.json()
+                        resp_json = await req.json(loads=_json_loads)
                         if req.status == 200:
                             if "Content" not in resp_json:
                                 raise CyberarkAPIException(req.status, "INVALID_JSON",
                                                            "Could not find the password ('Content')",
-                                                           EPV_AIM.handle_error_detail_info(url, params_new))
+                                                           _AIMErrorDetail(url, params))
 
                             return filter_func(resp_json)
                         else:
@@ -437,32 +848,44 @@ class EPV_AIM:
                             if "Details" in resp_json:
                                 details = resp_json["Details"]
                             else:
-                                details = EPV_AIM.handle_error_detail_info(url, params_new)
-
-                            if "ErrorCode" in resp_json and "ErrorMsg" in resp_json:
-                                if resp_json["ErrorCode"] == "APPAP004E":
-                                    raise CyberarkAIMnotFound(req.status, resp_json["ErrorCode"], resp_json["ErrorMsg"],
-                                                              details)
-                                else:
-                                    raise CyberarkAPIException(req.status, resp_json["ErrorCode"],
-                                                               resp_json["ErrorMsg"], details)
-                            else:
-                                http_error = HTTPStatus(req.status)
+                                details = _AIMErrorDetail(url, params)
 
-                                raise CyberarkAPIException(req.status, "HTTP_ERR_CODE", http_error.phrase, details)
+                            raise _build_api_exception(req.status, resp_json, details)
 
                     except json.decoder.JSONDecodeError as err:
-                        http_error = HTTPStatus(req.status)
-                        details = EPV_AIM.handle_error_detail_info(url, params_new)
-                        raise CyberarkAPIException(req.status, "HTTP_ERR_CODE", http_error.phrase, details) from err
+                        details = _AIMErrorDetail(url, params)
+                        raise _build_api_exception(req.status, None, details) from err
 
                     except (KeyError, ValueError, ContentTypeError) as err:
                         # http_error = HTTPStatus(req.status)
                         print(await req.text())
-                        details = EPV_AIM.handle_error_detail_info(url, params_new)
+                        details = _AIMErrorDetail(url, params)
                         raise CyberarkException(
                             f"HTTP error {req.status}: {str(err)} || Additional Details : {details}") from err
 
             except aiohttp.ClientError as err:
-                details = EPV_AIM.handle_error_detail_info(url, params_new)
+                details = _AIMErrorDetail(url, params)
                 raise CyberarkException(f"HTTP error: {str(err)} || Additional Details : {details}") from err
+
+
+@atexit.register
+def _close_shared_sessions():
+    """ Close the shared sessions still open (EPV_AIM instances never closed) """
+    for shared in list(EPV_AIM._shared_sessions.values()):
+        loop = shared.key[0]
+
+        if shared.session.closed or loop.is_running():
+            continue
+
+        if loop.is_closed():
+            # The connections are gone with their event loop, the session is closed on a temporary loop
+            loop = asyncio.new_event_loop()
+
+            try:
+                loop.run_until_complete(shared.session.close())
+            finally:
+                loop.close()
+        else:
+            loop.run_until_complete(shared.session.close())
+
+    EPV_AIM._shared_sessions.clear()
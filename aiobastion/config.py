@@ -1,19 +1,143 @@
 # -*- coding: utf-8 -*-
 
+import copy
+import functools
+import os
+import socket
 import yaml
 import warnings
+from types import MappingProxyType
 from .exceptions import AiobastionConfigurationException
-from .cyberark import EPV
-from .accounts import Account
-from .safe import Safe
+from .defaults import (
+    CYBERARK_DEFAULT_KEEP_COOKIES, CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS, CYBERARK_DEFAULT_TIMEOUT,
+    CYBERARK_DEFAULT_VERIFY, CYBERARK_OPTIONS_MODULES_LIST
+)
 from .aim import EPV_AIM
 # from .aim import EPV_AIM
 
+try:
+    # libyaml parser (C extension), when PyYAML has been built with it
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+# Global sections of the configuration file (in lowercase)
+_VALID_TOP_SECTIONS = frozenset([
+    "aim", "connection", "cpm",
+    "label", "pvwa", "retention",
+    "custom",                   # Customer use only (not aibastion)
+    "customipfield",            # Compatibility - deprecated
+])
+
+# Sections of the optional modules (account, safe, ...)
+_OPTIONS_MODULES_SET = frozenset(CYBERARK_OPTIONS_MODULES_LIST)
+
+# Connection section attributes: {keyname: Config attribute}
+_CONNECTION_ATTRIBUTES = {
+    "appid":        "appid",
+    "authtype":     "authtype",
+    "password":     "password",
+    "user_search":  "user_search",
+    "username":     "username",
+}
+
+# Boolean values specified as a string (in lowercase)
+_TRUE_STRINGS = frozenset(["y", "yes", "true", "on", "1"])
+_FALSE_STRINGS = frozenset(["n", "no", "false", "off", "0"])
+
+
+def _lc(s):
+    """Lowercase a key name, without a copy when it is already in lowercase"""
+    return s if s.islower() else s.lower()
+
+
+# Configuration files already parsed: {(path, modification time, size): configuration}
+_yaml_cache = {}
+
+# Secret attributes of the configuration file: {section: attribute} (in lowercase)
+_SECRET_ATTRIBUTES = {
+    "aim": "passphrase",
+    "connection": "password",
+}
+
+
+def _parse_yaml(configfile):
+    with open(configfile, 'rb', buffering=1 << 16) as config:
+        return yaml.load(config, Loader=_YamlLoader)
+
+
+def _has_secrets(configuration) -> bool:
+    for section, definition in configuration.items():
+        attr_name = _SECRET_ATTRIBUTES.get(_lc(section)) if isinstance(section, str) else None
+
+        if attr_name and isinstance(definition, dict) and \
+                any(isinstance(k, str) and _lc(k) == attr_name for k in definition):
+            return True
+
+    return False
+
+
+def _load_yaml(configfile):
+    """Parse a YAML configuration file, the result is cached by path, modification time and size.
+    A configuration with secrets (password, passphrase) is never cached: EPV clears the password
+    after login, a copy must not stay in memory.
+    A copy is returned since the configuration is modified while it is read."""
+    try:
+        st = os.stat(configfile)
+    except OSError:
+        # Let open() raise the error
+        return _parse_yaml(configfile)
+
+    cache_key = (os.path.abspath(configfile), st.st_mtime_ns, st.st_size)
+    configuration = _yaml_cache.get(cache_key)
+
+    if configuration is None:
+        configuration = _parse_yaml(configfile)
+
+        if not isinstance(configuration, dict) or _has_secrets(configuration):
+            return configuration
+
+        if len(_yaml_cache) >= 32:
+            _yaml_cache.clear()
+
+        _yaml_cache[cache_key] = configuration
+
+    return copy.deepcopy(configuration)
+
 
 class Config:
     """Parse a config file into an object"""
+    __slots__ = (
+        "configfile",
+        # Global section
+        "AIM", "Connection", "CPM", "custom", "customIPField", "Label", "label", "retention",
+        # Connection section
+        "appid", "authtype", "password", "user_search", "username",
+        # PVWA section
+        "PVWA", "max_concurrent_tasks", "timeout", "PVWA_CA", "keep_cookies",
+        # Optional configuration like account, safe, ...
+        "options_modules",
+    )
 
     def __init__(self, configfile):
+        self._apply(_load_yaml(configfile), configfile)
+
+    @classmethod
+    def from_dict(cls, cfg_dict: dict, source: str = "<dict>"):
+        """Build the configuration from an already parsed configuration (same layout as the YAML file)
+
+        :param cfg_dict: the configuration dictionary
+        :param source: name of the configuration used in the error messages
+        """
+        if not isinstance(cfg_dict, dict):
+            raise AiobastionConfigurationException(f"Malformed configuration in {source}: {cfg_dict!r}")
+
+        self = cls.__new__(cls)
+        # The configuration is modified while it is read
+        self._apply(copy.deepcopy(cfg_dict), source)
+        return self
+
+    def _apply(self, configuration, configfile):
         self.configfile = configfile
 
         # Global section initialization
@@ -34,38 +158,20 @@ class Config:
 
         # PVWA section initialization
         self.PVWA = None
-        self.max_concurrent_tasks = EPV.CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS
-        self.timeout = EPV.CYBERARK_DEFAULT_TIMEOUT
-        self.PVWA_CA = EPV.CYBERARK_DEFAULT_VERIFY
-        self.keep_cookies = EPV.CYBERARK_DEFAULT_KEEP_COOKIES
-
-        # Optional configuration like account, safe, ...
-        options_modules = {}
-
-        for module in EPV.CYBERARK_OPTIONS_MODULES_LIST:
-            self.options_modules[module] = {}
+        self.max_concurrent_tasks = CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS
+        self.timeout = CYBERARK_DEFAULT_TIMEOUT
+        self.PVWA_CA = CYBERARK_DEFAULT_VERIFY
+        self.keep_cookies = CYBERARK_DEFAULT_KEEP_COOKIES
 
-        with open(configfile, 'r') as config:
-            configuration = yaml.safe_load(config)
+        # Optional configuration like account, safe, ... (AIM only when its section is defined)
+        self.options_modules = {}
 
-        # Change global section name in lowercase
-        for k in list(configuration.keys()):
-            keyname = k.lower()
+        # Change global section name in lowercase (the original name is kept for the messages)
+        section_names = {_lc(k): k for k in configuration}
+        configuration = {_lc(k): v for k, v in configuration.items()}
 
-            if keyname not in [
-                               "aim", "connection", "cpm",
-                               "label", "pvwa", "retention",
-                               "custom",                # Customer use only (not aibastion)
-                               "customipfield",         # Compatibility - deprecated
-                               ]:
-
-                if keyname not in EPV.CYBERARK_OPTIONS_MODULES_LIST:
-                    warnings.warn(f"aiobastion - Unknown section '{k}' in {self.configfile}")
-                continue
-
-            if k != keyname:
-                # change the keyname in lowercase
-                configuration[keyname] = configuration.pop(k)
+        for keyname in sorted(configuration.keys() - _VALID_TOP_SECTIONS - _OPTIONS_MODULES_SET):
+            warnings.warn(f"aiobastion - Unknown section '{section_names[keyname]}' in {self.configfile}")
 
         # Read global sections in the right order
         if "connection" in configuration and configuration["connection"]:
@@ -89,6 +195,10 @@ class Config:
             self.options_modules["AIM"] = self._read_section_aim(configuration["aim"])
 
 
+        # Imported here, the accounts and safe modules import this module
+        from .accounts import Account
+        from .safe import Safe
+
         # account module
         if self.custom and \
             ("LOGON_ACCOUNT_INDEX" in self.custom or
@@ -119,23 +229,16 @@ class Config:
 
 
     def _read_section_connection(self, configuration):
-        for k in list(configuration.keys()):
-            keyname = k.lower()
-
-            if keyname == "appid":
-                self.appid = configuration[k]
-            elif keyname == "authtype":
-                self.authtype = configuration[k]
-            elif keyname == "password":
-                self.password = configuration[k]
-            elif keyname == "user_search":
-                self.user_search = configuration[k]
-            elif keyname == "username":
-                self.username = configuration[k]
-            else:
+        for k, v in configuration.items():
+            keyname = _lc(k)
+
+            attr_name = _CONNECTION_ATTRIBUTES.get(keyname)
+            if attr_name is None:
                 raise AiobastionConfigurationException(f"Unknown attribute '{k}' within section 'connection' "
                                                        f"in {self.configfile}")
 
+            setattr(self, attr_name, v)
+
         # user_search dictionary Validation
         if self.user_search:
             if not isinstance(self.user_search, dict):
@@ -143,39 +246,38 @@ class Config:
                                                        f"'connection' in {self.configfile}: {self.user_search!r}")
 
 
-            for k in list(self.user_search.keys()):
-                keyname = k.lower()
+            user_search = {_lc(k): v for k, v in self.user_search.items()}
 
-                # Check user_search parameter name
-                if keyname not in EPV_AIM._GETPASSWORD_REQUEST_PARM:
-                    raise AiobastionConfigurationException(f"Unknown attribute '{k}' within section "
-                                                           f"'connection/user_search' in {self.configfile}")
+            # Check user_search parameter name
+            if not user_search.keys() <= EPV_AIM._GETPASSWORD_REQUEST_PARM:
+                k = next(k for k in self.user_search if k.lower() not in EPV_AIM._GETPASSWORD_REQUEST_PARM)
+                raise AiobastionConfigurationException(f"Unknown attribute '{k}' within section "
+                                                       f"'connection/user_search' in {self.configfile}")
 
-                if k != keyname:
-                    self.user_search[keyname] = self.user_search.pop(k)
+            self.user_search = user_search
 
     def _read_section_pvwa(self, configuration):
         synonym_PVWA_CA = 0
         synonym_max_concurrent_tasks = 0
 
-        for k in list(configuration.keys()):
-            keyname = k.lower()
+        for k, v in configuration.items():
+            keyname = _lc(k)
 
-            if keyname == "host":
-                self.PVWA = configuration[k]
-            elif keyname == "timeout":
-                self.timeout = self._to_integer("PVWA/" + k, configuration[k])
-            elif keyname == "maxtasks" or keyname == "max_concurrent_tasks":
-                self.max_concurrent_tasks = self._to_integer("PVWA/" + k, configuration[k])
-                synonym_max_concurrent_tasks += 1
-            elif keyname == "keep_cookies":
-                self.keep_cookies = self._to_bool("PVWA/" + k, configuration[k])
-            elif keyname == "verify" or keyname == "ca":
-                self.PVWA_CA = configuration[k]
-                synonym_PVWA_CA += 1
-            else:
+            parser = _PVWA_ATTRIBUTES.get(keyname)
+            if parser is None:
                 raise AiobastionConfigurationException(f"Unknown attribute '{k}' within section 'PVWA' in {self.configfile}")
 
+            attr_name, converter = parser
+            if converter is not None:
+                v = converter(self, "PVWA/" + k, v)
+
+            setattr(self, attr_name, v)
+
+            if attr_name == "PVWA_CA":
+                synonym_PVWA_CA += 1
+            elif attr_name == "max_concurrent_tasks":
+                synonym_max_concurrent_tasks += 1
+
         if synonym_PVWA_CA > 1:
             raise AiobastionConfigurationException(f"Duplicate synonym parameter: 'ca', 'verify' within section 'PVWA' "
                                                    f"in {self.configfile}. Specify only one of them.")
@@ -190,40 +292,14 @@ class Config:
 
         # Value that may come from PVWA
         pvwa = {
-            "appid": self.AIM["appid"],
+            "appid": self.appid,
             "host": self.PVWA,
             "timeout": self.timeout,
             "max_concurrent_tasks": self.max_concurrent_tasks,
             "verify": self.PVWA_CA
         }
 
-        return EPV_AIM._init_complete_with_pvwa(self.options_modules["aim"], pvwa, "AIM", self.configfile)
-
-
-    def _read_section_account(self, module, configuration):
-        for k in list(configuration.keys()):
-            keyname = k.lower()
-
-            if keyname == "logon_account_index":
-                self.options_modules[module][k] = self._to_integer(module + "/" + k, configuration[k])
-            elif keyname == "reconcile_account_index":
-                self.options_modules[module][k] = self._to_integer(module + "/" + k, configuration[k])
-            else:
-                raise AiobastionConfigurationException(f"Unknown attribute '{k}' within section '{module}' "
-                                                       f"in {self.configfile}")
-
-
-    def _read_section_safe(self, module, configuration):
-        for k in list(configuration.keys()):
-            keyname = k.lower()
-
-            if keyname == "cpm":
-                self.options_modules[module][k] = configuration[k]
-            elif keyname == "retention":
-                self.options_modules[module][k] = self._to_integer(module + "/" + k, configuration[k])
-            else:
-                raise AiobastionConfigurationException(f"Unknown attribute '{k}' within section '{module}' "
-                                                       f"in {self.configfile}")
+        return EPV_AIM._init_complete_with_pvwa(self.AIM, pvwa, "AIM", self.configfile)
 
     def _to_integer(self, section_key, val):
         try:
@@ -241,9 +317,9 @@ class Config:
             # In case the value has been speficied has a string (see https://yaml.org/type/bool.html)
             val = val.lower()
 
-            if val in ["y", "yes", "true", "on"]:
+            if val in _TRUE_STRINGS:
                 v = True
-            elif val in ["n", "no", "false", "off"]:
+            elif val in _FALSE_STRINGS:
                 v = False
             else:
                 raise AiobastionConfigurationException(f"Invalid boolean within '{section_key}'"
@@ -254,8 +330,23 @@ class Config:
 
         return v
 
+
+# PVWA section attributes: {keyname: (Config attribute, converter)}
+_PVWA_ATTRIBUTES = {
+    "host":                 ("PVWA", None),
+    "timeout":              ("timeout", Config._to_integer),
+    "maxtasks":             ("max_concurrent_tasks", Config._to_integer),     # synonym
+    "max_concurrent_tasks": ("max_concurrent_tasks", Config._to_integer),
+    "keep_cookies":         ("keep_cookies", Config._to_bool),
+    "ca":                   ("PVWA_CA", None),                                # synonym
+    "verify":               ("PVWA_CA", None),
+}
+
+# The permission templates are shared by all callers (see permissions()): they are read-only,
+# copy them with dict() to modify them.
+
 # No rights at all
-DEFAULT_PERMISSIONS = {
+DEFAULT_PERMISSIONS = MappingProxyType({
         "UseAccounts": False,
         "RetrieveAccounts": False,
         "ListAccounts": False,
@@ -276,11 +367,11 @@ DEFAULT_PERMISSIONS = {
         "CreateFolders": False,
         "DeleteFolders": False,
         "MoveAccountsAndFolders": False
-    }
+    })
 
 # Can create object
-PROV_PERMISSIONS = dict(DEFAULT_PERMISSIONS)
-PROV_PERMISSIONS.update({
+PROV_PERMISSIONS = MappingProxyType({
+        **DEFAULT_PERMISSIONS,
         "ListAccounts": True,
         "AddAccounts": True,
         "UpdateAccountContent": True,
@@ -297,39 +388,50 @@ PROV_PERMISSIONS.update({
         "MoveAccountsAndFolders": True
     })
 
-MANAGER_PERMISSIONS = dict(PROV_PERMISSIONS)
-MANAGER_PERMISSIONS.update({
+MANAGER_PERMISSIONS = MappingProxyType({
+    **PROV_PERMISSIONS,
     "ManageSafe": True,
     "ManageSafeMembers": True,
     "ViewSafeMembers": True,
 })
 
 # all to true
-ADMIN_PERMISSIONS = {perm: True for perm in DEFAULT_PERMISSIONS}
+ADMIN_PERMISSIONS = MappingProxyType({perm: True for perm in DEFAULT_PERMISSIONS})
 
 # connect
-USE_PERMISSIONS = dict(DEFAULT_PERMISSIONS)
-USE_PERMISSIONS["UseAccounts"] = True
-USE_PERMISSIONS["ListAccounts"] = True
-# Connect does not necessarily require AccessWithoutConfirmation
-# USE_PERMISSIONS["AccessWithoutConfirmation"] = True
+USE_PERMISSIONS = MappingProxyType({
+    **DEFAULT_PERMISSIONS,
+    "UseAccounts": True,
+    "ListAccounts": True,
+    # Connect does not necessarily require AccessWithoutConfirmation
+    # "AccessWithoutConfirmation": True,
+})
 
 # use + retrieve
-SHOW_PERMISSIONS = dict(USE_PERMISSIONS)
-SHOW_PERMISSIONS["RetrieveAccounts"] = True
+SHOW_PERMISSIONS = MappingProxyType({
+    **USE_PERMISSIONS,
+    "RetrieveAccounts": True,
+})
 
 # list accounts + audit part
-AUDIT_PERMISSIONS = dict(DEFAULT_PERMISSIONS)
-AUDIT_PERMISSIONS["ListAccounts"] = True
-AUDIT_PERMISSIONS["ViewAuditLog"] = True
-AUDIT_PERMISSIONS["ViewSafeMembers"] = True
+AUDIT_PERMISSIONS = MappingProxyType({
+    **DEFAULT_PERMISSIONS,
+    "ListAccounts": True,
+    "ViewAuditLog": True,
+    "ViewSafeMembers": True,
+})
 
 # power user = SHOW + AUDIT
-POWER_PERMISSIONS = dict(DEFAULT_PERMISSIONS)
-POWER_PERMISSIONS.update({k: v for k, v in SHOW_PERMISSIONS.items() if v})
-POWER_PERMISSIONS.update({k: v for k, v in AUDIT_PERMISSIONS.items() if v})
+POWER_PERMISSIONS = MappingProxyType({
+    **DEFAULT_PERMISSIONS,
+    "UseAccounts": True,
+    "RetrieveAccounts": True,
+    "ListAccounts": True,
+    "ViewAuditLog": True,
+    "ViewSafeMembers": True,
+})
 
-CPM_PERMISSIONS = {
+CPM_PERMISSIONS = MappingProxyType({
         "UseAccounts": True,
         "RetrieveAccounts": True,
         "ListAccounts": True,
@@ -352,7 +454,7 @@ CPM_PERMISSIONS = {
         "CreateFolders": True,
         "DeleteFolders": True,
         "MoveAccountsAndFolders": True
-}
+})
 
 # v2 perm
 V2_BASE = {
@@ -396,60 +498,79 @@ V2_AUDIT = {"viewAuditLog": True}
 
 
 def validate_ip(s):
-    a = s.split('.')
-    if len(a) != 4:
+    # Dotted-decimal IPv4 address, checked by the C library
+    try:
+        socket.inet_pton(socket.AF_INET, s)
+    except OSError:
         return False
-    for x in a:
-        if not x.isdigit():
-            return False
-        i = int(x)
-        if i < 0 or i > 255:
-            return False
     return True
 
 def flatten(A):
+    # Iterative depth-first walk of the nested lists (no recursion)
     rt = []
-    for i in A:
-        if isinstance(i,list):
-            rt.extend(flatten(i))
-        else:
+    stack = [iter(A)]
+    while stack:
+        for i in stack[-1]:
+            if isinstance(i, list):
+                stack.append(iter(i))
+                break
             rt.append(i)
+        else:
+            stack.pop()
     return rt
 
-def permissions(profile: str) -> dict:
-    if "admin" in profile.lower():
-        return ADMIN_PERMISSIONS
-    if "use" in profile.lower():
-        return USE_PERMISSIONS
-    if "show" in profile.lower():
-        return SHOW_PERMISSIONS
-    if "audit" in profile.lower():
-        return SHOW_PERMISSIONS
-    if "prov" in profile.lower():
-        return PROV_PERMISSIONS
-    if "power" in profile.lower():
-        return POWER_PERMISSIONS
-    if "cpm" in profile.lower():
-        return CPM_PERMISSIONS
-    if "manager" in profile.lower():
-        return MANAGER_PERMISSIONS
-    else:
-        # nothing !
-        return DEFAULT_PERMISSIONS
+# Profile name keyword and its permissions, the first matching keyword wins
+_PROFILE_PERMISSIONS = (
+    ("admin", ADMIN_PERMISSIONS),
+    ("use", USE_PERMISSIONS),
+    ("show", SHOW_PERMISSIONS),
+    ("audit", SHOW_PERMISSIONS),
+    ("prov", PROV_PERMISSIONS),
+    ("power", POWER_PERMISSIONS),
+    ("cpm", CPM_PERMISSIONS),
+    ("manager", MANAGER_PERMISSIONS),
+)
+
+
+def permissions(profile: str) -> MappingProxyType:
+    """ Return the (read-only) permissions of a profile name """
+    return _permissions(profile.lower())
+
+
+@functools.lru_cache(maxsize=64)
+def _permissions(profile: str) -> MappingProxyType:
+    for keyword, perm in _PROFILE_PERMISSIONS:
+        if keyword in profile:
+            return perm
+
+    # nothing !
+    return DEFAULT_PERMISSIONS
+
+
+# v2 profile name and its required permissions, in display order
+_V2_PROFILES = (
+    ("Admin", tuple(V2_ADMIN.items())),
+    ("Audit", tuple(V2_AUDIT.items())),
+    ("Show", tuple(V2_SHOW.items())),
+    ("Change", tuple(V2_CHANGE.items())),
+    ("Use", tuple(V2_USE.items())),
+)
+
+
+# Permissions checked by the v2 profiles
+_V2_PROFILE_KEYS = tuple(dict.fromkeys(k for _, required in _V2_PROFILES for k, _ in required))
 
 
 def get_v2_profile(permission) -> str:
-    perms = []
-    if all(t for t in [permission[k] == v for k, v in V2_ADMIN.items()]):
-        perms.append("Admin")
-    if all(t for t in [permission[k] == v for k, v in V2_AUDIT.items()]):
-        perms.append("Audit")
-    if all(t for t in [permission[k] == v for k, v in V2_SHOW.items()]):
-        perms.append("Show")
-    if all(t for t in [permission[k] == v for k, v in V2_CHANGE.items()]):
-        perms.append("Change")
-    if all(t for t in [permission[k] == v for k, v in V2_USE.items()]):
-        perms.append("Use")
+    # Only the permissions checked by the profiles are part of the cache key
+    return _get_v2_profile(tuple(permission[k] for k in _V2_PROFILE_KEYS))
+
+
+@functools.lru_cache(maxsize=64)
+def _get_v2_profile(values: tuple) -> str:
+    permission = dict(zip(_V2_PROFILE_KEYS, values))
+    perms = [name for name, required in _V2_PROFILES
+             if all(permission[k] == v for k, v in required)]
     if len(perms) == 0:
         perms.append("Profil Inconnu")
     return " + ".join(perms)
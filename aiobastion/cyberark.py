@@ -10,6 +10,7 @@ import copy
 from aiohttp import ContentTypeError
 import aiohttp
 
+from . import defaults
 from .accountgroup import AccountGroup
 from .accounts import Account
 from .aim import EPV_AIM
@@ -29,13 +30,13 @@ class EPV:
     """
     Class that represent the connection, or future connection, to the Vault.
     """
-    # Default value
-    CYBERARK_DEFAULT_KEEP_COOKIES = False
-    CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS = 10
-    CYBERARK_DEFAULT_RETENTION = 10
-    CYBERARK_DEFAULT_TIMEOUT = 30
-    CYBERARK_DEFAULT_VERIFY = True
-    CYBERARK_OPTIONS_MODULES_LIST = [ "AIM", "account", "safe"]
+    # Default value (see defaults.py)
+    CYBERARK_DEFAULT_KEEP_COOKIES = defaults.CYBERARK_DEFAULT_KEEP_COOKIES
+    CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS = defaults.CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS
+    CYBERARK_DEFAULT_RETENTION = defaults.CYBERARK_DEFAULT_RETENTION
+    CYBERARK_DEFAULT_TIMEOUT = defaults.CYBERARK_DEFAULT_TIMEOUT
+    CYBERARK_DEFAULT_VERIFY = defaults.CYBERARK_DEFAULT_VERIFY
+    CYBERARK_OPTIONS_MODULES_LIST = defaults.CYBERARK_OPTIONS_MODULES_LIST
 
     def __init__(self, configfile: str = None, serialized: dict = None, token: str = None):
         # Logging stuff
@@ -166,7 +167,7 @@ class EPV:
 
         # AIM Communication
         if "AIM" in serialized:
-            serialized_aim = EPV_AIM._init_validate_class_attributes(serialized, "AIM")
+            serialized_aim = EPV_AIM._init_validate_class_attributes(serialized["AIM"], "AIM")
 
             # Value that may come from PVWA
             pvwa = {
@@ -177,7 +178,7 @@ class EPV:
                 "verify": self.verify
             }
 
-            options_modules["aim"] = EPV_AIM._init_complete_with_pvwa(serialized_aim, pvwa, "AIM")
+            options_modules["AIM"] = EPV_AIM._init_complete_with_pvwa(serialized_aim, pvwa, "AIM")
 
         if "account" in serialized:
             options_modules["account"] = \
@@ -186,18 +187,14 @@ class EPV:
             options_modules["account"] = \
                 Account._init_validate_class_attributes({}, "account")
 
-        if "retention" in serialized:
-            options_modules["safe"]["retention"] = serialized['retention']
-
-
         if "safe" in serialized and \
             ("cmp" in serialized or "retention" in serialized):
             raise AiobastionException("Remove cmp' and 'retention' if you specify 'safe'.")
 
         if "safe" in serialized:
-            options_modules["safe"] = Safe.check_parm(serialized["safe"])
+            options_modules["safe"] = Safe._init_validate_class_attributes(serialized["safe"], "safe")
         else:
-            options_modules["safe"] = {}
+            options_modules["safe"] = Safe._init_validate_class_attributes({}, "safe")
 
         if "cpm" in serialized:
             options_modules["safe"]["cpm"] = serialized["cpm"]
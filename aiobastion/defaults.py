@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""
+Default values of the EPV definition (also available as EPV.CYBERARK_*).
+
+This module must not import any other module of the package: the modules imported by
+cyberark.py (aim.py, config.py, ...) need these values before the EPV class is defined.
+"""
+CYBERARK_DEFAULT_KEEP_COOKIES = False
+CYBERARK_DEFAULT_MAX_CONCURRENT_TASKS = 10
+CYBERARK_DEFAULT_RETENTION = 10
+CYBERARK_DEFAULT_TIMEOUT = 30
+CYBERARK_DEFAULT_VERIFY = True
+CYBERARK_OPTIONS_MODULES_LIST = ["AIM", "account", "safe"]
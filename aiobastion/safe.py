@@ -15,11 +15,11 @@ class Safe:
 
     def __init__(self, epv, cpm = None, retention = None):
         self.epv = epv
-        self.cpm  = Safe._SAFE_DEFAULT_RETENTION
+        self.cpm = Safe._SAFE_DEFAULT_CPM
         self.retention = Safe._SAFE_DEFAULT_RETENTION
 
         if cpm is not None:
-            self.cmp = cpm
+            self.cpm = cpm
 
         if retention is not None:
             self.retention = retention
@@ -187,11 +187,11 @@ class Safe:
         """
         if isinstance(profile, str):
             assert profile.lower() in ["admin", "use", "show", "audit", "prov", "power", "cpm", "manager"]
-            perm = permissions(profile)
+            perm = dict(permissions(profile))
         else:
             # ensure there is at least one right for the safe username
             assert any(k in profile.keys() for k in DEFAULT_PERMISSIONS.keys())
-            perm = profile
+            perm = dict(profile)
 
         url = f"api/Safes/{safe}/Members"
 
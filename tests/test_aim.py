@@ -0,0 +1,325 @@
+import asyncio
+import contextlib
+import os
+import ssl
+import tempfile
+import unittest
+import unittest.mock
+
+from aiobastion import aim
+from aiobastion.aim import EPV_AIM
+from aiobastion.exceptions import AiobastionException, AiobastionConfigurationException, CyberarkAIMnotFound
+
+
+class TestAIMSetup(unittest.TestCase):
+    """ Offline tests of the AIM definition (no vault needed) """
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.cert = os.path.join(self.tmpdir.name, "cert.pem")
+        open(self.cert, "w").close()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_unreadable_files(self):
+        # Not a directory in the path (NotADirectoryError), not only missing files
+        bad_path = os.path.join(self.cert, "file.pem")
+
+        for params in ({"cert": bad_path},
+                       {"cert": self.cert, "key": bad_path},
+                       {"cert": self.cert, "verify": bad_path}):
+            epv_aim = EPV_AIM(**{"host": "aim.acme.fr", "appid": "app", "verify": False, **params})
+
+            with self.assertRaises(AiobastionException):
+                epv_aim.validate_and_setup_aim_ssl()
+
+    def test_ca_renewed(self):
+        ca = os.path.join(self.tmpdir.name, "ca.pem")
+        open(ca, "w").close()
+        epv_aim = EPV_AIM(host="aim.acme.fr", appid="app", cert=self.cert, verify=ca)
+
+        # No real certificate: each SSL context is a new object
+        with unittest.mock.patch.object(aim, "_new_ssl_context", side_effect=lambda *args: object()):
+            epv_aim.validate_and_setup_aim_ssl()
+            ssl_context = epv_aim.request_params["ssl"]
+
+            epv_aim.validate_and_setup_aim_ssl()
+            self.assertIs(ssl_context, epv_aim.request_params["ssl"])
+
+            # The CA bundle is renewed: the SSL context is rebuilt
+            st = os.stat(ca)
+            os.utime(ca, (st.st_atime, st.st_mtime + 10))
+            epv_aim.validate_and_setup_aim_ssl()
+            self.assertIsNot(ssl_context, epv_aim.request_params["ssl"])
+
+
+class TestAIMDefinition(unittest.TestCase):
+    def test_integer(self):
+        serialized_aim = EPV_AIM._init_validate_class_attributes({"timeout": "5", "maxtasks": 3}, "AIM")
+        self.assertEqual(5, serialized_aim["timeout"])
+        self.assertEqual(3, serialized_aim["max_concurrent_tasks"])
+
+        for value in ("abc", None, [1]):
+            with self.assertRaises(AiobastionConfigurationException):
+                EPV_AIM._init_validate_class_attributes({"timeout": value}, "AIM")
+
+    def test_attribute_exact_name(self):
+        # The attribute names must match exactly (not a part of them)
+        for keyname in ("tim", "out", "connection_timeout", "timeouts"):
+            with self.assertRaises(AiobastionConfigurationException):
+                EPV_AIM._init_validate_class_attributes({keyname: 1}, "AIM")
+
+    def test_synonyms(self):
+        with self.assertRaises(AiobastionConfigurationException):
+            EPV_AIM._init_validate_class_attributes({"ca": "ca.pem", "verify": "ca.pem"}, "AIM")
+
+        with self.assertRaises(AiobastionConfigurationException):
+            EPV_AIM._init_validate_class_attributes({"maxtasks": 1, "max_concurrent_tasks": 1}, "AIM")
+
+
+class TestAIMRequestParams(unittest.TestCase):
+    def setUp(self):
+        self.aim = EPV_AIM(host="aim.acme.fr", appid="App", cert="cert.pem", verify=False)
+
+    def test_default_appid(self):
+        query = {"Safe": "safe1", "Object": "account1"}
+        params = self.aim._get_secret_params(query)
+
+        self.assertEqual({"safe": "safe1", "object": "account1", "appid": "App"}, params)
+        self.assertEqual({"Safe": "safe1", "Object": "account1"}, query)
+
+    def test_override_appid(self):
+        params = self.aim._get_secret_params({"AppID": "Other", "object": "account1"})
+        self.assertEqual({"object": "account1", "appid": "Other"}, params)
+
+    def test_unknown_param(self):
+        with self.assertRaises(AiobastionException):
+            self.aim._get_secret_params({"object": "account1", "password": "x"})
+
+        with self.assertRaises(AiobastionException):
+            self.aim._get_secret_params(["object"])
+
+
+class _FakeResponse:
+    def __init__(self, params):
+        self.params = params
+        self.status = 404 if params["object"] == "missing" else 200
+
+    async def json(self, loads=None):
+        if self.status == 404:
+            return {"ErrorCode": "APPAP004E", "ErrorMsg": "Password object matching query not found"}
+
+        return {"Content": "pw-" + self.params["object"], "appid": self.params["appid"]}
+
+
+class _FakeSession:
+    """ Answer the AIM requests once *release* is set (no network) """
+    closed = False
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.started = 0
+
+    @contextlib.asynccontextmanager
+    async def request(self, method, url, params=None, **kwargs):
+        self.started += 1
+        await self.release.wait()
+        yield _FakeResponse(params)
+
+    async def close(self):
+        self.closed = True
+
+
+class TestAIMConcurrency(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.aim = EPV_AIM(host="aim.acme.fr", appid="App", cert="cert.pem", verify=False, max_concurrent_tasks=1)
+        self.aim.request_params = {}
+        self.session = self.aim.session = _FakeSession()
+
+    async def test_close_session_while_waiting(self):
+        first = asyncio.ensure_future(self.aim.get_secret(object="a1"))
+        second = asyncio.ensure_future(self.aim.get_secret(object="a2"))
+        await asyncio.sleep(0.01)
+        self.assertEqual(1, self.session.started)
+
+        # The waiting request must still be admitted when the running one is done
+        await self.aim.close_aim_session()
+        self.session.release.set()
+
+        self.assertEqual(["pw-a1", "pw-a2"], await asyncio.wait_for(asyncio.gather(first, second), 1))
+
+    async def test_cancelled_waiter(self):
+        self.session.release.set()
+        self.aim.get_aim_session()
+        admission = self.aim._admission
+
+        # A request is running, two are waiting
+        await admission.__aenter__()
+        second = asyncio.ensure_future(self.aim.get_secret(object="a2"))
+        third = asyncio.ensure_future(self.aim.get_secret(object="a3"))
+        await asyncio.sleep(0.01)
+
+        # The waiter woken up by the running request is cancelled before it runs (asyncio.wait_for timeout):
+        # the next waiter must be admitted
+        await admission.__aexit__(None, None, None)
+        second.cancel()
+
+        self.assertEqual("pw-a3", await asyncio.wait_for(third, 1))
+        self.assertTrue(second.cancelled())
+        self.assertEqual(0, admission.count)
+
+    async def test_set_concurrency(self):
+        tasks = [asyncio.ensure_future(self.aim.get_secret(object=f"a{i}")) for i in range(3)]
+        await asyncio.sleep(0.01)
+        self.assertEqual(1, self.session.started)
+
+        await self.aim.set_concurrency(3)
+        await asyncio.sleep(0.01)
+        self.assertEqual(3, self.session.started)
+
+        self.session.release.set()
+        self.assertEqual(["pw-a0", "pw-a1", "pw-a2"], await asyncio.wait_for(asyncio.gather(*tasks), 1))
+
+        with self.assertRaises(AiobastionException):
+            await self.aim.set_concurrency(0)
+
+    async def test_get_secret_bulk(self):
+        self.session.release.set()
+        await self.aim.set_concurrency(2)
+
+        queries = [{"Object": f"a{i}"} for i in range(5)] + [{"object": "a5", "appid": "Other"}]
+        result = await self.aim.get_secret_bulk(queries)
+
+        self.assertEqual([f"pw-a{i}" for i in range(6)], [r.secret for r in result])
+        self.assertEqual(["App"] * 5 + ["Other"], [r.detail["appid"] for r in result])
+        self.assertEqual({"Object": "a0"}, queries[0])
+
+    async def test_get_secret_bulk_errors(self):
+        self.session.release.set()
+        queries = [{"object": "a1"}, {"object": "missing"}]
+
+        with self.assertRaises(CyberarkAIMnotFound):
+            await self.aim.get_secret_bulk(queries)
+
+        result = await self.aim.get_secret_bulk(queries, return_exceptions=True)
+        self.assertEqual("pw-a1", result[0].secret)
+        self.assertIsInstance(result[1], CyberarkAIMnotFound)
+
+        # Only the masked appid is kept in the details of the error
+        self.assertEqual({"object": "missing", "appid": "<hidden>"}, result[1].details.params)
+        self.assertNotIn("App", str(result[1]))
+
+        # Invalid parameters are detected before any request is sent
+        started = self.session.started
+        with self.assertRaises(AiobastionException):
+            await self.aim.get_secret_bulk([{"object": "a1"}, {"unknown": "x"}])
+        self.assertEqual(started, self.session.started)
+
+
+class TestAIMSharedSession(unittest.IsolatedAsyncioTestCase):
+    def _new_aim(self, max_concurrent_tasks):
+        epv_aim = EPV_AIM(host="aim.acme.fr", appid="App", cert="cert.pem", verify=False,
+                          max_concurrent_tasks=max_concurrent_tasks)
+        # As set by validate_and_setup_aim_ssl
+        epv_aim.request_params = {"timeout": 30, "ssl": self.ssl_context}
+        return epv_aim
+
+    def setUp(self):
+        self.ssl_context = ssl.create_default_context()
+
+    async def asyncTearDown(self):
+        await EPV_AIM.close_shared_sessions()
+
+    async def test_shared_pool(self):
+        a = self._new_aim(2)
+        b = self._new_aim(10)
+
+        self.assertIs(a.get_aim_session(), b.get_aim_session())
+
+        # The pool does not limit the instances, each one has its own limit
+        self.assertEqual(0, a.session.connector.limit)
+        self.assertEqual(2, a._admission.limit)
+        self.assertEqual(10, b._admission.limit)
+
+    async def test_closed_by_last_user(self):
+        a = self._new_aim(2)
+        b = self._new_aim(2)
+        session = a.get_aim_session()
+        b.get_aim_session()
+
+        await a.close_aim_session()
+        self.assertFalse(session.closed)
+
+        await b.close_aim_session()
+        self.assertTrue(session.closed)
+        self.assertEqual({}, EPV_AIM._shared_sessions)
+
+    async def test_close_shared_sessions(self):
+        a = self._new_aim(2)
+        b = self._new_aim(2)
+        session = a.get_aim_session()
+        b.get_aim_session()
+
+        await EPV_AIM.close_shared_sessions()
+        self.assertTrue(session.closed)
+
+        # A new shared session is opened, and closed by its last user
+        new_session = a.get_aim_session()
+        self.assertIsNot(session, new_session)
+        self.assertIs(new_session, b.get_aim_session())
+
+        await a.close_aim_session()
+        await b.close_aim_session()
+        self.assertTrue(new_session.closed)
+        self.assertEqual({}, EPV_AIM._shared_sessions)
+
+
+class TestAIMSharedSessionAtExit(unittest.TestCase):
+    def test_event_loop_closed(self):
+        async def open_session():
+            epv_aim = EPV_AIM(host="aim.acme.fr", appid="App", cert="cert.pem", verify=False)
+            epv_aim.request_params = {"timeout": 30, "ssl": ssl.create_default_context()}
+            return epv_aim.get_aim_session()
+
+        # The EPV_AIM instance is never closed
+        session = asyncio.run(open_session())
+        self.assertFalse(session.closed)
+
+        aim._close_shared_sessions()
+        self.assertTrue(session.closed)
+        self.assertEqual({}, EPV_AIM._shared_sessions)
+
+    def test_no_running_loop(self):
+        # A shared session is keyed by the running event loop, never by a loop that is not running
+        epv_aim = EPV_AIM(host="aim.acme.fr", appid="App", cert="cert.pem", verify=False)
+        epv_aim.request_params = {"timeout": 30, "ssl": ssl.create_default_context()}
+
+        with self.assertRaises(RuntimeError):
+            epv_aim.get_aim_session()
+
+        self.assertEqual({}, EPV_AIM._shared_sessions)
+
+
+class TestAIMCaches(unittest.TestCase):
+    """ The passphrase must not be kept by the caches of the AIM definitions """
+
+    def test_validated_attributes_without_passphrase(self):
+        for passphrase in ("secret1", "secret2", None):
+            serialized_aim = EPV_AIM._init_validate_class_attributes(
+                {"host": "aim.acme.fr", "Passphrase": passphrase}, "AIM")
+
+            self.assertEqual(passphrase, serialized_aim["passphrase"])
+            self.assertEqual("aim.acme.fr", serialized_aim["host"])
+
+        self.assertNotIn("secret", repr(EPV_AIM._validated_attributes))
+
+    def test_passphrase_digest(self):
+        self.assertEqual(aim._passphrase_digest("secret"), aim._passphrase_digest(b"secret"))
+        self.assertNotEqual(aim._passphrase_digest("secret"), aim._passphrase_digest("secret2"))
+        self.assertNotIn(b"secret", aim._passphrase_digest("secret"))
+        self.assertIsNone(aim._passphrase_digest(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
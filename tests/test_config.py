@@ -1,8 +1,11 @@
 import asyncio
 import os
+import tempfile
 import unittest
 from unittest import IsolatedAsyncioTestCase
+import yaml
 import aiobastion
+import aiobastion.config
 import tests
 from aiobastion import CyberarkException
 
@@ -96,6 +99,180 @@ class TestEPV(IsolatedAsyncioTestCase):
 
 
 
+class TestConfig(unittest.TestCase):
+    """ Offline tests of the configuration parsing (no vault needed) """
+
+    def test_from_dict(self):
+        config = aiobastion.config.Config.from_dict({"PVWA": {"Host": "pvwa.acme.fr", "timeout": "60"}})
+        self.assertEqual("<dict>", config.configfile)
+        self.assertEqual("pvwa.acme.fr", config.PVWA)
+        self.assertEqual(60, config.timeout)
+        self.assertEqual(2, config.options_modules["account"]["logon_account_index"])
+        self.assertEqual(3, config.options_modules["account"]["reconcile_account_index"])
+
+    def test_from_dict_same_as_file(self):
+        cfg_dict = {"connection": {"username": "def", "authtype": "cyberark"},
+                    "pvwa": {"host": "host1"},
+                    "account": {"logon_account_index": 3, "reconcile_account_index": 1}}
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            configfile = os.path.join(tmpdir, "config.yml")
+            with open(configfile, "w") as f:
+                yaml.safe_dump(cfg_dict, f)
+
+            from_file = aiobastion.config.Config(configfile)
+
+        from_dict = aiobastion.config.Config.from_dict(cfg_dict, source=configfile)
+
+        for attr_name in aiobastion.config.Config.__slots__:
+            self.assertEqual(getattr(from_file, attr_name, None), getattr(from_dict, attr_name, None), attr_name)
+
+    def test_from_dict_does_not_modify_the_dict(self):
+        cfg_dict = {"PVWA": {"Host": "pvwa.acme.fr"}, "account": {"Logon_Account_Index": "3"}}
+        aiobastion.config.Config.from_dict(cfg_dict)
+        self.assertEqual({"PVWA": {"Host": "pvwa.acme.fr"}, "account": {"Logon_Account_Index": "3"}}, cfg_dict)
+
+    def test_epv_from_dict(self):
+        vault = aiobastion.EPV(serialized={"api_host": "pvwa.acme.fr",
+                                           "account": {"logon_account_index": 1},
+                                           "safe": {"cpm": "PasswordManager", "retention": "5"}})
+
+        self.assertEqual("pvwa.acme.fr", vault.api_host)
+        self.assertIsNone(vault.AIM)
+        self.assertEqual(1, vault.account.logon_account_index)
+        self.assertEqual(3, vault.account.reconcile_account_index)
+        self.assertEqual("PasswordManager", vault.safe.cpm)
+        self.assertEqual(5, vault.safe.retention)
+
+    def test_epv_from_file(self):
+        cfg_dict = {"connection": {"username": "def", "appid": "App"},
+                    "pvwa": {"host": "pvwa.acme.fr"},
+                    "aim": {"host": "aim.acme.fr", "cert": "cert.pem", "verify": "ca.pem"},
+                    "account": {"logon_account_index": 3, "reconcile_account_index": 1}}
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            configfile = os.path.join(tmpdir, "config.yml")
+            with open(configfile, "w") as f:
+                yaml.safe_dump(cfg_dict, f)
+
+            vault = aiobastion.EPV(configfile)
+
+        self.assertEqual("pvwa.acme.fr", vault.api_host)
+        self.assertEqual("aim.acme.fr", vault.AIM.host)
+        self.assertEqual("App", vault.AIM.appid)
+        self.assertEqual(3, vault.account.logon_account_index)
+        self.assertEqual(1, vault.account.reconcile_account_index)
+        self.assertIsNone(vault.safe.cpm)
+
+    def test_epv_from_file_without_aim(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            configfile = os.path.join(tmpdir, "config.yml")
+            with open(configfile, "w") as f:
+                yaml.safe_dump({"connection": {"username": "def"}, "pvwa": {"host": "pvwa.acme.fr"}}, f)
+
+            config = aiobastion.config.Config(configfile)
+            vault = aiobastion.EPV(configfile)
+
+        self.assertEqual({"account", "safe"}, config.options_modules.keys())
+        self.assertIsNone(vault.AIM)
+        self.assertEqual(2, vault.account.logon_account_index)
+
+    def test_unknown_section(self):
+        with self.assertWarns(UserWarning) as cm:
+            aiobastion.config.Config.from_dict({"PVWA": {"host": "host1"}, "Foo": {}})
+
+        self.assertIn("Unknown section 'Foo'", str(cm.warning))
+
+    def test_yaml_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            configfile = os.path.join(tmpdir, "config.yml")
+            with open(configfile, "w") as f:
+                yaml.safe_dump({"pvwa": {"host": "host1"}}, f)
+
+            aiobastion.config.Config(configfile)
+            self.assertIn({"pvwa": {"host": "host1"}}, aiobastion.config._yaml_cache.values())
+
+    def test_yaml_cache_without_secrets(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            configfile = os.path.join(tmpdir, "config.yml")
+            with open(configfile, "w") as f:
+                yaml.safe_dump({"connection": {"username": "def", "Password": "s3cr3t"},
+                                "pvwa": {"host": "host1"}}, f)
+
+            config = aiobastion.config.Config(configfile)
+            self.assertEqual("s3cr3t", config.password)
+            self.assertNotIn("s3cr3t", repr(aiobastion.config._yaml_cache))
+
+    def test_from_dict_invalid(self):
+        with self.assertRaises(aiobastion.exceptions.AiobastionConfigurationException):
+            aiobastion.config.Config.from_dict(["pvwa"])
+
+        with self.assertRaises(aiobastion.exceptions.AiobastionConfigurationException):
+            aiobastion.config.Config.from_dict({"pvwa": {"unknown": 1}})
+
+        with self.assertRaises(aiobastion.exceptions.AiobastionConfigurationException):
+            aiobastion.config.Config.from_dict({"account": {"logon_account_index": "abc"}})
+
+
+class TestConfigUtilities(unittest.TestCase):
+    def test_to_integer(self):
+        config = aiobastion.config.Config.from_dict({"pvwa": {"host": "host1", "maxtasks": "5"}})
+        self.assertEqual(5, config.max_concurrent_tasks)
+
+        with self.assertRaises(aiobastion.exceptions.AiobastionConfigurationException):
+            aiobastion.config.Config.from_dict({"pvwa": {"host": "host1", "timeout": "abc"}})
+
+
+    def test_permissions(self):
+        self.assertEqual(aiobastion.config.SHOW_PERMISSIONS, aiobastion.config.permissions("audit"))
+        self.assertEqual(aiobastion.config.ADMIN_PERMISSIONS, aiobastion.config.permissions("Vault Admin"))
+        self.assertEqual(aiobastion.config.DEFAULT_PERMISSIONS, aiobastion.config.permissions("unknown"))
+
+
+    def test_validate_ip(self):
+        for address in ("10.0.0.1", "0.0.0.0", "255.255.255.255"):
+            self.assertTrue(aiobastion.config.validate_ip(address), address)
+
+        # Leading zeros are rejected (ambiguous: octal or decimal)
+        for address in ("010.0.0.1", "1.2.3", "256.1.1.1", "a.b.c.d", "1.2.3.4 ", ""):
+            self.assertFalse(aiobastion.config.validate_ip(address), address)
+
+
+    def test_flatten(self):
+        self.assertEqual([1, 2, 3, 4, 5], aiobastion.config.flatten([1, [2, [3, [4]]], [], 5]))
+        self.assertEqual([], aiobastion.config.flatten([]))
+
+
+    def test_get_v2_profile(self):
+        admin_audit = {**aiobastion.config.V2_BASE, **aiobastion.config.V2_ADMIN, **aiobastion.config.V2_AUDIT}
+
+        # Twice: the second result comes from the cache
+        for _ in range(2):
+            self.assertEqual("Admin + Audit + Use", aiobastion.config.get_v2_profile(admin_audit))
+            self.assertEqual("Use", aiobastion.config.get_v2_profile(aiobastion.config.V2_BASE))
+
+        self.assertEqual("Profil Inconnu",
+                         aiobastion.config.get_v2_profile({**aiobastion.config.V2_BASE, "useAccounts": False}))
+
+
+    def test_power_permissions(self):
+        # power user = SHOW + AUDIT
+        expected = {k: aiobastion.config.SHOW_PERMISSIONS[k] or aiobastion.config.AUDIT_PERMISSIONS[k]
+                    for k in aiobastion.config.DEFAULT_PERMISSIONS}
+
+        self.assertEqual(expected, aiobastion.config.POWER_PERMISSIONS)
+        self.assertEqual(aiobastion.config.POWER_PERMISSIONS, aiobastion.config.permissions("Power"))
+
+
+    def test_to_bool(self):
+        for value, expected in (("yes", True), ("Off", False), ("1", True), ("0", False), (True, True)):
+            config = aiobastion.config.Config.from_dict({"pvwa": {"host": "host1", "keep_cookies": value}})
+            self.assertIs(expected, config.keep_cookies, value)
+
+        with self.assertRaises(aiobastion.exceptions.AiobastionConfigurationException):
+            aiobastion.config.Config.from_dict({"pvwa": {"host": "host1", "keep_cookies": "maybe"}})
+
+
 if __name__ == "__main__":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     unittest.main()
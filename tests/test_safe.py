@@ -1,5 +1,8 @@
+import json
 from unittest import IsolatedAsyncioTestCase
 import aiobastion
+import aiobastion.config
+import aiobastion.safe
 import random
 import tests
 from aiobastion import CyberarkAPIException, CyberarkException, AiobastionException
@@ -174,3 +177,34 @@ class TestSafe(IsolatedAsyncioTestCase):
         # undo
         ret = await self.vault.safe.rename(new_name, safe_to_rename)
         self.assertIn(safe_to_rename, [s["safeName"] for s in await self.vault.safe.search(safe_to_rename)])
+
+
+class TestSafeMemberProfile(IsolatedAsyncioTestCase):
+    """ Offline tests: the request sent to the vault is recorded instead """
+
+    class _RecordingEPV:
+        def __init__(self):
+            self.requests = []
+
+        async def handle_request(self, method, url, data=None, **kwargs):
+            # The data must be JSON serializable
+            self.requests.append((method, url, json.loads(json.dumps(data))))
+            return True
+
+    async def test_add_member_profile(self):
+        epv = self._RecordingEPV()
+        safe = aiobastion.safe.Safe(epv)
+
+        await safe.add_member_profile("safe1", "user1", "admin")
+        await safe.add_member_profile("safe1", "user1", aiobastion.config.ADMIN_PERMISSIONS)
+
+        self.assertEqual(epv.requests[0], epv.requests[1])
+        self.assertEqual(dict(aiobastion.config.ADMIN_PERMISSIONS), epv.requests[0][2]["Permissions"])
+
+    def test_permissions_read_only(self):
+        with self.assertRaises(TypeError):
+            aiobastion.config.permissions("use")["ManageSafe"] = True
+
+        perm = dict(aiobastion.config.permissions("use"))
+        perm["ManageSafe"] = True
+        self.assertFalse(aiobastion.config.USE_PERMISSIONS["ManageSafe"])